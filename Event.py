@@ -1,18 +1,22 @@
-import hashlib
-
 class Event:
+    __slots__ = ("payload", "_hash")
+
     def __init__(self, payload):
-        if not payload.endswith("\n"):
+        # Payloads are kept as UTF-8 bytes; str input is encoded once here
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if not payload.endswith(b"\n"):
             # Append a newline to the output to make it easier to process by other tools
-            self.payload = payload + "\n"
+            self.payload = payload + b"\n"
         else:
             self.payload = payload
+        self._hash = hash(self.payload)
 
     def __hash__(self):
-        return hashlib.sha256(self.payload.encode()).hexdigest()
+        return self._hash
 
     def __str__(self):
-        return self.payload
+        return self.payload.decode("utf-8")
 
     def to_byte_buffer(self):
-        return bytes(self.payload, encoding="utf-8")
\ No newline at end of file
+        return self.payload
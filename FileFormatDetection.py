@@ -1,12 +1,19 @@
 from dataclasses import dataclass, field
-from typing import Dict, Any, Tuple, BinaryIO, Optional
+from typing import Dict, Any, FrozenSet, List, Tuple, BinaryIO, Optional
 from io import BytesIO
+import mmap
 import os
 
 _version_ = "0.1.0"
 _author_ = "Your Name"  # Replace with your name or organization
 _license_ = "MIT"  # Or whichever license you prefer
 
+# Format families used by the FileFormatDetection predicates
+_COMPRESSED = frozenset({"gzip", "zstd", "bzip2", "lz4-frame", "xz", "snappy-framed", "brotli"})
+_ARCHIVE = frozenset({"zip", "7z", "tar"})
+_COLUMNAR = frozenset({"parquet", "orc"})
+
+
 # -------------------------------------------------------------------------
 # Class: FileFormatDetection
 # -------------------------------------------------------------------------
@@ -26,24 +33,25 @@ class FileFormatDetection:
     evidence: str
     extra: Dict[str, Any] = field(default_factory=dict)
 
+    def __post_init__(self):
+        # Lowercase once; the predicates below are called repeatedly
+        self._fmt = self.format.lower()
+
     def is_known(self) -> bool:
         """Return True if the format is identified with nonzero confidence."""
-        return self.format.lower() != "unknown" and self.confidence > 0.0
+        return self._fmt != "unknown" and self.confidence > 0.0
 
     def is_compressed(self) -> bool:
         """Return True if this format is a compression algorithm."""
-        return self.format.lower() in {
-            "gzip", "zstd", "bzip2", "lz4-frame",
-            "xz", "snappy-framed", "brotli"
-        }
+        return self._fmt in _COMPRESSED
 
     def is_archive(self) -> bool:
         """Return True if this format is an archive container."""
-        return self.format.lower() in {"zip", "7z", "tar"}
+        return self._fmt in _ARCHIVE
 
     def is_columnar(self) -> bool:
         """Return True if this format is a columnar storage format."""
-        return self.format.lower() in {"parquet", "orc"}
+        return self._fmt in _COLUMNAR
 
     def summary(self) -> str:
         """Return a concise human-readable summary of the detection."""
@@ -124,10 +132,100 @@ SIGNATURES = {
 }
 
 
+# -------------------------------------------------------------------------
+# File-extension shortcut (used when the name alone is trusted)
+# -------------------------------------------------------------------------
+SUFFIX_MAP = {
+    ".snz": "snappy-framed",
+    ".snappy": "snappy-framed",
+    ".gz": "gzip",
+    ".zst": "zstd",
+    ".bz2": "bzip2",
+    ".xz": "xz",
+    ".7z": "7z",
+    ".zip": "zip",
+    ".tar": "tar",
+    ".parquet": "parquet",
+    ".orc": "orc",
+}
+
+
+# -------------------------------------------------------------------------
+# First-byte dispatch index and literal tables over SIGNATURES
+# -------------------------------------------------------------------------
+_START_INDEX: Dict[int, List[str]] = {}
+_UNANCHORED: List[str] = []
+
+# Anchored literal tables: kind -> (distinct pattern lengths, {literal: formats}).
+# "start"/"tar_magic" literals are matched against a prefix, "end" against a suffix.
+_LITERAL_TABLES: Dict[str, Tuple[Tuple[int, ...], Dict[bytes, FrozenSet[str]]]] = {}
+
+
+def _build_literal_table(kind: str) -> Tuple[Tuple[int, ...], Dict[bytes, FrozenSet[str]]]:
+    """Group every non-empty `kind` pattern in SIGNATURES by its literal bytes."""
+    by_literal: Dict[bytes, set] = {}
+    for fmt, sig in SIGNATURES.items():
+        for p in sig.get(kind, []):
+            if p:
+                by_literal.setdefault(p, set()).add(fmt)
+    lengths = tuple(sorted({len(p) for p in by_literal}))
+    return lengths, {p: frozenset(fmts) for p, fmts in by_literal.items()}
+
+
+def _match_literals(buf: bytes, kind: str, suffix: bool = False) -> FrozenSet[str]:
+    """
+    Return every format with a `kind` literal anchored at the start (or end) of buf.
+    
+    One slice plus one dict lookup per distinct pattern length, instead of one
+    startswith/endswith call per pattern per signature.
+    """
+    lengths, table = _LITERAL_TABLES[kind]
+    hits: FrozenSet[str] = frozenset()
+    for n in lengths:
+        if n > len(buf):
+            break
+        fmts = table.get(buf[-n:] if suffix else buf[:n])
+        if fmts:
+            hits = hits | fmts
+    return hits
+
+
+def _rebuild_start_index() -> None:
+    """
+    Rebuild the first-byte dispatch index and literal tables from SIGNATURES.
+    
+    Every 'start' pattern is anchored at offset 0, so a format can only match
+    if its pattern's first byte equals head[0]. For each such byte we keep the
+    candidate formats in SIGNATURES order, merged with the formats that have no
+    'start' pattern (heuristics, tail/TAR checks) so priority is unchanged.
+    """
+    unanchored = [fmt for fmt, sig in SIGNATURES.items() if not sig.get("start")]
+    first_bytes = {
+        p[0]
+        for sig in SIGNATURES.values()
+        for p in sig.get("start", [])
+        if p
+    }
+    index: Dict[int, List[str]] = {}
+    for b in first_bytes:
+        index[b] = [
+            fmt for fmt, sig in SIGNATURES.items()
+            if not sig.get("start") or any(p and p[0] == b for p in sig["start"])
+        ]
+    _START_INDEX.clear()
+    _START_INDEX.update(index)
+    _UNANCHORED[:] = unanchored
+    for kind in ("start", "end", "tar_magic"):
+        _LITERAL_TABLES[kind] = _build_literal_table(kind)
+
+
+_rebuild_start_index()
+
+
 # -------------------------------------------------------------------------
 # Helpers for signature sniffing
 # -------------------------------------------------------------------------
-def _read_ranges(fp: BinaryIO, head_n: int = 64, tail_n: int = 64,
+def _read_ranges(fp: BinaryIO, head_n: int = 16, tail_n: int = 16,
                  tar_probe_offset: int = 257, tar_probe_len: int = 8) -> Tuple[bytes, bytes, bytes]:
     """
     Read head, tail, and a slice around TAR's magic position from a seekable stream.
@@ -170,19 +268,52 @@ def _read_ranges(fp: BinaryIO, head_n: int = 64, tail_n: int = 64,
     return head, tail, tar_slice
 
 
-def _detect_from_ranges(head: bytes, tail: bytes, tar_slice: bytes) -> FileFormatDetection:
-    """Apply signature checks to the extracted byte ranges."""
-    def starts_with_any(buf: bytes, patterns: list) -> bool:
-        return any(buf.startswith(p) for p in patterns if p)
+def _contains_any(buf: bytes, patterns: list) -> bool:
+    """Return True if any non-empty pattern occurs anywhere in buf."""
+    return any(p in buf for p in patterns if p)
 
-    def ends_with_any(buf: bytes, patterns: list) -> bool:
-        return any(buf.endswith(p) for p in patterns if p)
 
-    def contains_any(buf: bytes, patterns: list) -> bool:
-        return any(p in buf for p in patterns if p)
+def _mmap_ranges(fp: BinaryIO, head_n: int = 16, tail_n: int = 16,
+                 tar_probe_offset: int = 257, tar_probe_len: int = 8) -> Tuple[bytes, bytes, bytes]:
+    """
+    Same as _read_ranges, but slices a read-only memory map of a real file.
+    
+    One mmap call replaces the seek/read pairs; only the touched pages are
+    faulted in, and nothing is read at all when they are already cached.
+    Empty files cannot be mapped and fall back to _read_ranges.
+    
+    Args:
+        fp: A binary file object backed by a file descriptor.
+        head_n: Number of bytes to read from the start.
+        tail_n: Number of bytes to read from the end.
+        tar_probe_offset: Offset for TAR magic check.
+        tar_probe_len: Length of TAR magic slice.
+    
+    Returns:
+        Tuple of (head bytes, tail bytes, tar_slice bytes).
+    """
+    if os.fstat(fp.fileno()).st_size == 0:
+        return _read_ranges(fp, head_n, tail_n, tar_probe_offset, tar_probe_len)
+
+    with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        head = mm[:head_n]
+        tail = mm[max(0, size - tail_n):]
+        tar_slice = b""
+        if size >= tar_probe_offset + tar_probe_len:
+            tar_slice = mm[tar_probe_offset:tar_probe_offset + tar_probe_len]
+
+    return head, tail, tar_slice
+
+
+def _detect_from_ranges(head: bytes, tail: bytes, tar_slice: bytes) -> FileFormatDetection:
+    """Apply signature checks to the extracted byte ranges."""
+    # Only formats whose start pattern shares head[0] (plus unanchored ones) can match
+    candidates = _START_INDEX.get(head[0], _UNANCHORED) if head else _UNANCHORED
 
     # Check in priority order (more specific first)
-    for fmt, sig in SIGNATURES.items():
+    for fmt in candidates:
+        sig = SIGNATURES[fmt]
         confidence = sig.get("confidence", 1.0)
 
         if "heuristic" in sig:
@@ -190,19 +321,16 @@ def _detect_from_ranges(head: bytes, tail: bytes, tar_slice: bytes) -> FileForma
                 return FileFormatDetection(fmt, confidence, sig["evidence"], {})
             continue
 
-        match = True
-
-        if "start" in sig and not starts_with_any(head, sig["start"]):
-            match = False
-        if "end" in sig and not ends_with_any(tail, sig["end"]):
-            match = False
-        if "end_contains" in sig and not contains_any(tail, sig["end_contains"]):
-            match = False
-        if "tar_magic" in sig and not starts_with_any(tar_slice, sig["tar_magic"]):
-            match = False
+        if "start" in sig and fmt not in _match_literals(head, "start"):
+            continue
+        if "end" in sig and fmt not in _match_literals(tail, "end", suffix=True):
+            continue
+        if "end_contains" in sig and not _contains_any(tail, sig["end_contains"]):
+            continue
+        if "tar_magic" in sig and fmt not in _match_literals(tar_slice, "tar_magic"):
+            continue
 
-        if match:
-            return FileFormatDetection(fmt, confidence, sig["evidence"], {})
+        return FileFormatDetection(fmt, confidence, sig["evidence"], {})
 
     # Unknown
     return FileFormatDetection("unknown", 0.0, "No decisive signature found.", {})
@@ -211,14 +339,19 @@ def _detect_from_ranges(head: bytes, tail: bytes, tar_slice: bytes) -> FileForma
 # -------------------------------------------------------------------------
 # Main Function: sniff_format (filepath-based)
 # -------------------------------------------------------------------------
-def sniff_format(file_path: str, head_n: int = 64, tail_n: int = 64) -> FileFormatDetection:
+def sniff_format(file_path: str, head_n: int = 16, tail_n: int = 16) -> FileFormatDetection:
     """
     Identify common compression/archival/columnar formats by signatures from a file path.
     
+    16 bytes at each end cover every built-in signature: the longest start
+    pattern (snappy-framed) is 10 bytes, Parquet's footer magic is the last 4,
+    and ORC's magic sits just before the final postscript-length byte. Pass
+    larger values for custom signatures that need more.
+    
     Args:
         file_path: Path to the file.
-        head_n: Bytes to read from the start (default: 64).
-        tail_n: Bytes to read from the end (default: 64).
+        head_n: Bytes to read from the start (default: 16).
+        tail_n: Bytes to read from the end (default: 16).
     
     Returns:
         FileFormatDetection object.
@@ -228,16 +361,60 @@ def sniff_format(file_path: str, head_n: int = 64, tail_n: int = 64) -> FileForm
     
     try:
         with open(file_path, "rb") as fp:
-            head, tail, tar_slice = _read_ranges(fp, head_n, tail_n)
+            head, tail, tar_slice = _mmap_ranges(fp, head_n, tail_n)
             return _detect_from_ranges(head, tail, tar_slice)
     except Exception as e:
         return FileFormatDetection("unknown", 0.0, f"I/O error: {str(e)}", {})
 
 
+# -------------------------------------------------------------------------
+# Function: format_from_suffix (name-based, no I/O)
+# -------------------------------------------------------------------------
+def format_from_suffix(file_name: str) -> Optional[FileFormatDetection]:
+    """
+    Classify a file by its extension alone, without opening it.
+    
+    Useful when names come from a trusted source (e.g. a known S3 prefix) and
+    sniffing would only confirm what the suffix already says.
+    
+    Args:
+        file_name: File name, path, or object key.
+    
+    Returns:
+        FileFormatDetection with confidence 0.9, or None if the suffix is unknown.
+    """
+    suffix = os.path.splitext(file_name)[1].lower()
+    fmt = SUFFIX_MAP.get(suffix)
+    if fmt is None:
+        return None
+    return FileFormatDetection(fmt, 0.9, f"File extension '{suffix}' ({fmt}).", {})
+
+
 # -------------------------------------------------------------------------
 # Function: sniff_stream (file-like object)
 # -------------------------------------------------------------------------
-def sniff_stream(stream: BinaryIO, head_n: int = 64, tail_n: int = 64,
+def sniff_head(head: bytes) -> FileFormatDetection:
+    """
+    Identify format from the leading bytes alone (e.g. a peek at a pipe).
+    
+    Tail-based checks cannot run, so a known result has reduced confidence
+    and is marked as partial in its evidence.
+    
+    Args:
+        head: Bytes from the start of the data.
+    
+    Returns:
+        FileFormatDetection object.
+    """
+    # Mock tail and tar_slice as empty (limits detection)
+    partial_detection = _detect_from_ranges(head, b"", b"")
+    if partial_detection.is_known():
+        partial_detection.confidence *= 0.8  # Reduce confidence for partial
+        partial_detection.evidence += " (partial detection from head only)."
+    return partial_detection
+
+
+def sniff_stream(stream: BinaryIO, head_n: int = 16, tail_n: int = 16,
                  buffer_non_seekable: bool = True) -> FileFormatDetection:
     """
     Identify format from a file-like object.
@@ -269,13 +446,7 @@ def sniff_stream(stream: BinaryIO, head_n: int = 64, tail_n: int = 64,
         else:
             if not buffer_non_seekable:
                 # Partial detection: only head-based formats
-                head = stream.read(head_n)
-                # Mock tail and tar_slice as empty (limits detection)
-                partial_detection = _detect_from_ranges(head, b"", b"")
-                if partial_detection.is_known():
-                    partial_detection.confidence *= 0.8  # Reduce confidence for partial
-                    partial_detection.evidence += " (partial detection from head only)."
-                return partial_detection
+                return sniff_head(stream.read(head_n))
             
             # Buffer entire stream
             data = stream.read()
@@ -303,4 +474,5 @@ def add_signature(format_name: str, signature: Dict[str, Any], overwrite: bool =
     """
     if format_name in SIGNATURES and not overwrite:
         raise ValueError(f"Signature for '{format_name}' already exists. Use overwrite=True to update.")
-    SIGNATURES[format_name] = signature
\ No newline at end of file
+    SIGNATURES[format_name] = signature
+    _rebuild_start_index()
\ No newline at end of file
@@ -8,33 +8,102 @@ Version: a030626-dirty
 License: MIT
 """
 
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import boto3
 import FileFormatDetection
-from boto3 import session
+from boto3.s3.transfer import TransferConfig
+from botocore import UNSIGNED
+from botocore.client import Config
 
 region = "us-east-1"
 bucket_name = "aws-bigdata-blog"
 object_prefix = "artifacts/flink-refarch/data/nyc-tlc-trips.snz/"
+max_workers = 16
+per_object_concurrency = 8
+
+# Per-object multipart concurrency on top of the per-object thread pool
+transfer_config = TransferConfig(use_threads=True, max_concurrency=per_object_concurrency,
+                                 multipart_chunksize=16 * 1024 * 1024)
+
+# One client for every download so connections, TLS sessions and keepalive are
+# reused; the pool is sized for all workers' multipart threads at once.
+s3_config = Config(signature_version=UNSIGNED,
+                   max_pool_connections=max_workers * per_object_concurrency,
+                   tcp_keepalive=True,
+                   retries={'mode': 'standard'})
+s3_client = boto3.client('s3', region_name=region, config=s3_config)
+s3_resource = boto3.resource('s3', region_name=region, config=s3_config)
 
-session_ = session.Session()
-s3_resource = session_.resource('s3', region_name=region)
+# Worker threads only enqueue log records; one listener thread writes them out
+log_queue = queue.Queue(-1)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+logger.propagate = False
+log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+log_listener.start()
 
 bucket = s3_resource.Bucket(bucket_name)
-print("Files in S3 bucket:")
+logger.info("Files in S3 bucket:")
 # for obj in bucket.objects.filter(Prefix=object_prefix):
 #     # get_obj = s3_resource.Object(bucket_name, obj.key)
 #     print(obj.key)
 
-for obj in bucket.objects.filter(Prefix=object_prefix):
+# Downloaded files are handed to a single detection thread so sniffing
+# overlaps with the downloads still in flight.
+sniff_queue = queue.Queue()
+
+
+def _download_one(obj):
     target = obj.key.split("/")[-1]
-    if target:  # avoid downloading empty prefix
-        print(f"Downloading {obj.key} to {target}")
-        bucket.download_file(obj.key, "./"+target)
-        print(f"Downloaded {obj.key} to {target}")
-        res = FileFormatDetection.sniff_format("./"+target)
-        print(f'File Format detection summary for {target} is {res.summary()}')
-        print(f'File Format detection isColumar for {target} is {res.is_columnar()}')
-        print(f'File Format detection isCompressed for {target} is {res.is_compressed()}')
-        print(f'File Format detection metadata for {target} is {res.metadata()}')
-        print(target)
-        print(f"Size: {obj.size/(1024*1024)} MB")
\ No newline at end of file
+    if not target:  # avoid downloading empty prefix
+        return
+    logger.info(f"Downloading {obj.key} to {target}")
+    # Clients, unlike resources, are safe to share between threads
+    s3_client.download_file(bucket_name, obj.key, "./"+target, Config=transfer_config)
+    logger.info(f"Downloaded {obj.key} to {target}")
+    sniff_queue.put((target, obj.size))
+
+
+def _sniff_worker():
+    while True:
+        item = sniff_queue.get()
+        if item is None:
+            break
+        target, size = item
+        # Known extensions (every key under this prefix is .snz) skip the file read
+        res = FileFormatDetection.format_from_suffix(target) or FileFormatDetection.sniff_format("./"+target)
+        logger.info(f'File Format detection summary for {target} is {res.summary()}')
+        logger.info(f'File Format detection isColumar for {target} is {res.is_columnar()}')
+        logger.info(f'File Format detection isCompressed for {target} is {res.is_compressed()}')
+        logger.info(f'File Format detection metadata for {target} is {res.metadata()}')
+        logger.info(target)
+        logger.info(f"Size: {size/(1024*1024)} MB")
+
+
+sniffer = threading.Thread(target=_sniff_worker, name="Sniffer")
+sniffer.start()
+try:
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = {ex.submit(_download_one, obj): obj.key
+                   for obj in bucket.objects.filter(Prefix=object_prefix)}
+        # One failed download must not cancel or hide the others
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed downloading {futures[fut]}: {e}")
+    if failed:
+        logger.error(f"{failed} of {len(futures)} downloads failed")
+finally:
+    sniff_queue.put(None)
+    sniffer.join()
+    log_listener.stop()
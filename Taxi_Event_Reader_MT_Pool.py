@@ -5,16 +5,21 @@ from botocore.client import Config
 #from botocore.exceptions import NoCredentialsError, ClientError
 from botocore.exceptions import ClientError
 import logging
+import logging.handlers
+import multiprocessing
 
 import os
 import io
+import queue
+import re
 import threading
 import time
 import signal
 import sys
 
 import snappy
-from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, TimeoutError
 
 
 
@@ -28,23 +33,32 @@ BUCKET_NAME = "aws-bigdata-blog"
 OBJECT_PREFIX = "artifacts/flink-refarch/data/nyc-tlc-trips.snz/"
 MAX_FILES = 20
 OUTPUT_DIR = "./snappy_decompressed_events"
-MAX_WORKERS = min(10, MAX_FILES)  # Reduced from 20, don't exceed file count
+MAX_WORKERS = min(os.cpu_count() or 1, MAX_FILES)  # One process per core, don't exceed file count
 DOWNLOAD_TIMEOUT = 300  # 5 minutes timeout for downloads
-
-# ----------------------
-# Globals for simple stats
-# ----------------------
-stats_lock = threading.Lock()
-total_events = 0
-total_processing_time = 0.0
-earliest_time = None
-latest_time = None
+IO_BUFFER_SIZE = 1 << 20  # 1 MiB buffers for the decompress pipe and output file
+RANGE_PART_SIZE = 8 * 1024 * 1024  # Bytes per ranged GET
+RANGE_WORKERS = 8  # Ranged GETs in flight per object
+S3_POOL_CONNECTIONS = 64  # Shared client pool; covers RANGE_WORKERS with headroom for retries
+CHUNK_SIZE = 4 << 20  # Decompressed bytes handled per parse/write step
+DROPOFF_RE = re.compile(rb'"dropoff_datetime"\s*:\s*"([^"]+)"')
 
 # Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(threadName)s - %(message)s')
+LOG_FORMAT = '%(asctime)s - %(processName)s - %(message)s'
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 
+def setup_queue_logging(log_queue):
+    """Send this process's log records to log_queue instead of writing them itself.
+
+    Used for the parent and, as the pool initializer, for every worker process, so
+    only the parent's QueueListener thread ever writes to stderr.
+    """
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+
+
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully"""
     logger.info("Received interrupt signal, shutting down...")
@@ -61,139 +75,383 @@ def safe_filename_from_key(key: str, ext: str = ".ndjson") -> str:
 
 
 def list_s3_objects(bucket_name: str, prefix: str, max_files: int):
-    """Return up to max_files ObjectSummary entries (unsigned)."""
+    """Return up to max_files {"Bucket", "Key"} dicts (unsigned).
+
+    Uses the list_objects_v2 paginator rather than Bucket.objects.filter, which
+    wraps every key in a resource ObjectSummary. The client is local on purpose:
+    caching it in this (parent) process would hand it to every forked worker.
+    """
     try:
-        s3_res = session.Session().resource("s3", config=Config(signature_version=UNSIGNED))
-        bucket = s3_res.Bucket(bucket_name)
+        s3_client = session.Session().client("s3", region_name=REGION,
+                                             config=Config(signature_version=UNSIGNED))
+        paginator = s3_client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=bucket_name, Prefix=prefix,
+                                   PaginationConfig={"MaxItems": max_files, "PageSize": 1000})
         out = []
-        for i, obj in enumerate(bucket.objects.filter(Prefix=prefix)):
-            logger.info(f"Found: {obj.key}")
-            out.append(obj)
-            if i + 1 >= max_files:
-                break
-        return out
+        for page in pages:
+            for item in page.get("Contents", []):
+                logger.info(f"Found: {item['Key']}")
+                out.append({"Bucket": bucket_name, "Key": item["Key"]})
+        return out[:max_files]
     except Exception as e:
         logger.error(f"Error listing S3 objects: {e}")
         return []
 
 
-def download_and_decompress(obj_summary):
-    """Download and snappy-decompress; return (stream, read_time, size)."""
-    # Create a fresh S3 client for this thread to avoid contention
-    sess = session.Session()
-    s3_client = sess.client("s3", region_name=REGION,
-                            config=Config(signature_version=UNSIGNED,
-                                          read_timeout=DOWNLOAD_TIMEOUT,
-                                          retries={'max_attempts': 3}))
+class RangedBody(io.RawIOBase):
+    """Read-only stream over an S3 object fetched as concurrent ranged GETs.
+
+    Up to `workers` parts are downloading ahead of the reader, so one object is
+    pulled over several connections while memory stays bounded by
+    workers * part_size. Every range carries If-Match with the HEAD ETag, so an
+    overwrite mid-download fails the read instead of mixing object versions.
+    """
+
+    def __init__(self, s3_client, bucket_name, key, size, etag,
+                 part_size=RANGE_PART_SIZE, workers=RANGE_WORKERS):
+        super().__init__()
+        self._s3 = s3_client
+        self._bucket_name = bucket_name
+        self._key = key
+        self._etag = etag
+        self._ranges = deque((a, min(a + part_size, size) - 1) for a in range(0, size, part_size))
+        self._pending = deque()
+        self._current = memoryview(b"")
+        self._pool = ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix=f"{threading.current_thread().name}-range")
+        for _ in range(workers):
+            self._submit_next()
+
+    def _fetch(self, start, end):
+        resp = self._s3.get_object(Bucket=self._bucket_name, Key=self._key,
+                                   Range=f"bytes={start}-{end}", IfMatch=self._etag)
+        return resp["Body"].read()
+
+    def _submit_next(self):
+        if self._ranges:
+            start, end = self._ranges.popleft()
+            self._pending.append(self._pool.submit(self._fetch, start, end))
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        # Parts are consumed strictly in order; each one taken frees a slot for the next
+        while not self._current:
+            if not self._pending:
+                return 0
+            self._current = memoryview(self._pending.popleft().result())
+            self._submit_next()
+        n = min(len(b), len(self._current))
+        b[:n] = self._current[:n]
+        self._current = self._current[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pending.clear()
+            self._current = memoryview(b"")
+        super().close()
+
+
+def parallel_get(s3_client, bucket_name, key, part_size=RANGE_PART_SIZE, workers=RANGE_WORKERS):
+    """HEAD the object and return (RangedBody, size) streaming it via concurrent ranged GETs."""
+    head = s3_client.head_object(Bucket=bucket_name, Key=key)
+    size = head["ContentLength"]
+    body = RangedBody(s3_client, bucket_name, key, size, head["ETag"],
+                      part_size=part_size, workers=workers)
+    return body, size
+
+
+class SnappyPipe(threading.Thread):
+    """Decompress a snappy-framed source into the write end of a pipe on a background thread."""
+
+    def __init__(self, src, sink, name):
+        super().__init__(name=name, daemon=True)
+        self.src = src
+        self.sink = sink
+        self.error = None
+
+    def run(self):
+        try:
+            # Pull the body in 1 MiB reads rather than snappy's 64 KiB default
+            snappy.stream_decompress(src=self.src, dst=self.sink, blocksize=IO_BUFFER_SIZE)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.src.close()
+            try:
+                self.sink.close()
+            except OSError:
+                # Reader went away first; nothing left to flush to
+                pass
+
+
+# One S3 client per process, created on first use. A client built at import time
+# would be inherited by forked workers along with its open connections.
+_s3_client = None
+
+
+def get_s3_client():
+    """Return this process's shared S3 client (clients are thread-safe)."""
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = session.Session().client(
+            "s3", region_name=REGION,
+            config=Config(signature_version=UNSIGNED,
+                          read_timeout=DOWNLOAD_TIMEOUT,
+                          retries={'max_attempts': 3, 'mode': 'adaptive'},
+                          tcp_keepalive=True,
+                          max_pool_connections=S3_POOL_CONNECTIONS))
+    return _s3_client
+
+
+class BlockWriter(threading.Thread):
+    """Write (buf, end) blocks to a file on a background thread.
+
+    File writes release the GIL, so the worker can scan the next block while the
+    previous one is being written. At most `depth` blocks wait in the queue.
+    """
+
+    def __init__(self, fh, name, depth=2):
+        super().__init__(name=name, daemon=True)
+        self.fh = fh
+        self.blocks = queue.Queue(maxsize=depth)
+        # Written buffers come back here for iter_line_blocks to refill
+        self.free = queue.SimpleQueue()
+        self.error = None
+
+    def run(self):
+        while True:
+            item = self.blocks.get()
+            if item is None:
+                break
+            # Keep draining after a failure so the producer never blocks on put()
+            if self.error is None:
+                buf, end = item
+                try:
+                    self.fh.write(memoryview(buf)[:end])
+                except Exception as e:
+                    self.error = e
+                if isinstance(buf, bytearray):
+                    self.free.put(buf)
 
-    start = time.time()
-    try:
-        resp = s3_client.get_object(Bucket=obj_summary.bucket_name, Key=obj_summary.key)
-        payload = resp["Body"].read()
-        size = resp["ContentLength"]
+    def write(self, buf, end):
+        if self.error is not None:
+            raise self.error
+        self.blocks.put((buf, end))
+
+    def close(self):
+        self.blocks.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
 
-        # Decompress using smaller memory footprint
-        src = io.BytesIO(payload)
-        dst = io.BytesIO()
 
-        # Clear payload from memory immediately
-        del payload
+def download_and_decompress(bucket_name, key, s3_client=None):
+    """Open the object and start snappy-decompressing it; return (stream, read_time, size, decoder).
 
-        snappy.stream_decompress(src=src, dst=dst)
-        dst.seek(0)
+    The object is fetched as parallel ranged GETs and streamed straight into the
+    decompressor, and the returned stream is the read end of a pipe it feeds, so
+    parsing starts on the first decoded bytes instead of after the full object has
+    been downloaded and decompressed.
+    """
+    s3_client = s3_client or get_s3_client()
+
+    start = time.time()
+    try:
+        body, size = parallel_get(s3_client, bucket_name, key)
+
+        read_fd, write_fd = os.pipe()
+        stream = os.fdopen(read_fd, "rb", buffering=IO_BUFFER_SIZE)
+        sink = os.fdopen(write_fd, "wb", buffering=IO_BUFFER_SIZE)
+        decoder = SnappyPipe(body, sink, name=f"{threading.current_thread().name}-snappy")
+        decoder.start()
 
         read_time = max(0.0, time.time() - start)
-        return dst, read_time, size
+        return stream, read_time, size, decoder
 
     except ClientError as e:
-        logger.error(f"S3 error downloading {obj_summary.key}: {e}")
+        logger.error(f"S3 error downloading {key}: {e}")
         raise
     except Exception as e:
-        logger.error(f"Error downloading {obj_summary.key}: {e}")
+        logger.error(f"Error downloading {key}: {e}")
         raise
 
 
-def process_object(obj_summary):
-    """Process a single S3 object with improved error handling and resource management."""
-    thread_name = threading.current_thread().name
-    logger.info(f"Starting processing for {obj_summary.key}")
-
-    global total_events, total_processing_time, earliest_time, latest_time
+def iter_line_blocks(stream, chunk_size=None, free=None):
+    """Yield (buf, end) pairs where buf[:end] is a run of whole, newline-terminated lines.
+
+    Each block is read straight into a bytearray with readinto(); only the partial
+    last line is copied, to the front of the next buffer. Buffers the consumer is
+    done with and puts on `free` are reused instead of allocating new ones.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    # The partial last line of each block carries over to the next one
+    tail = b""
+    eof = False
+    while not eof:
+        buf = None
+        if free is not None:
+            try:
+                buf = free.get_nowait()
+            except queue.Empty:
+                pass
+        if buf is None or len(buf) <= len(tail):
+            buf = bytearray(max(chunk_size, 2 * len(tail)))
+        n = len(tail)
+        buf[:n] = tail
+        with memoryview(buf) as view:
+            while n < len(buf):
+                got = stream.readinto(view[n:])
+                if not got:
+                    eof = True
+                    break
+                n += got
+        nl = buf.rfind(b"\n", 0, n)
+        if nl < 0:
+            tail = bytes(buf[:n])
+            continue
+        # Take the tail before yielding; the consumer owns buf from here on
+        tail = bytes(buf[nl + 1:n])
+        yield buf, nl + 1
+    if tail:
+        yield tail + b"\n", len(tail) + 1
+
+
+def _is_utc_stamp(stamp):
+    # "Z" or no offset at all; "+hh:mm"/"-hh:mm" after the date would break byte order
+    return stamp.endswith(b"Z") or (b"+" not in stamp[10:] and b"-" not in stamp[10:])
+
+
+def timestamp_bounds(key, stamps):
+    """Return (min ms, max ms) over captured ISO-8601 dropoff times, or (None, None).
+
+    Zero-padded UTC timestamps of one shape order the same as their bytes, so in
+    the usual case only the smallest and largest captures are parsed instead of
+    every event's. Mixed shapes, explicit UTC offsets, or an unparseable extreme
+    fall back to parsing each capture.
+    """
+    if not stamps:
+        return None, None
+    if len(set(map(len, stamps))) == 1 and all(map(_is_utc_stamp, stamps)):
+        try:
+            return TripEvent.parse_timestamp(min(stamps)), TripEvent.parse_timestamp(max(stamps))
+        except ValueError:
+            pass
+
+    chunk_min = None
+    chunk_max = None
+    malformed = 0
+    for stamp in stamps:
+        try:
+            ts_ms = TripEvent.parse_timestamp(stamp)
+        except ValueError:
+            malformed += 1
+            continue
+        if chunk_min is None or ts_ms < chunk_min:
+            chunk_min = ts_ms
+        if chunk_max is None or ts_ms > chunk_max:
+            chunk_max = ts_ms
+    # One log record per chunk, not one per bad line
+    if malformed:
+        logger.warning(f"{key}: Ignoring {malformed} malformed timestamps")
+    return chunk_min, chunk_max
+
+
+def process_chunk(key, buf, end, writer):
+    """Queue buf[:end] for writing unchanged; return (event count, min dropoff ms, max dropoff ms).
+
+    The lines are never decoded or split: the block is written in one call and
+    scanned in place by the compiled regex. Blank or malformed lines are copied
+    through with the rest, but only lines with a dropoff_datetime count as events.
+    """
+    writer.write(buf, end)
+
+    stamps = DROPOFF_RE.findall(buf, 0, end)
+    chunk_min, chunk_max = timestamp_bounds(key, stamps)
+
+    return len(stamps), chunk_min, chunk_max
+
+
+def process_object(bucket_name, key):
+    """Process a single S3 object in a worker process.
+
+    Returns (out_path, events, proc_time, min_ts, max_ts, worker_name); the parent
+    process merges these, so no state is shared between workers.
+    """
+    worker_name = multiprocessing.current_process().name
+    logger.info(f"Starting processing for {key}")
 
     try:
-        key = obj_summary.key
-        stream, read_time, size = download_and_decompress(obj_summary)
+        stream, read_time, size, decoder = download_and_decompress(bucket_name, key)
 
-        bps = (size / read_time) if read_time > 0 else float("inf")
-        logger.info(f"Downloaded {key}: {size} bytes in {read_time:.2f}s ({bps:.2f} B/s)")
+        logger.info(f"Opened {key}: {size} bytes, first response in {read_time:.2f}s")
 
-        file_format = FileFormatDetection.sniff_stream(stream)
+        # The pipe is not seekable; sniff the buffered head without consuming it.
+        # Only head signatures can match, so the result is marked as partial.
+        file_format = FileFormatDetection.sniff_head(stream.peek(16)[:16])
         logger.info(f"Detected file format for {key}: {file_format}")
-        stream.seek(0)
 
-        # Prepare output
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        # Prepare output (run() has already created OUTPUT_DIR)
         out_path = os.path.join(OUTPUT_DIR, safe_filename_from_key(key, ".ndjson"))
 
         events = 0
+        local_min = None
+        local_max = None
         start_proc = time.time()
 
-        # Use smaller buffer and ensure proper cleanup
-        with open(out_path, "w", encoding="utf-8", buffering=8192) as fh:  # Reduced buffer
+        with open(out_path, "wb", buffering=IO_BUFFER_SIZE) as fh:
+            writer = BlockWriter(fh, name=f"{worker_name}-writer")
+            writer.start()
             try:
-                for raw in stream:
-                    try:
-                        line = raw.decode("unicode_escape")
-                        ev = TripEvent(line)
-                        ts_ms = ev.timestamp
-
-                        # Update bounds with lock
-                        if ts_ms is not None:
-                            with stats_lock:
-                                if earliest_time is None or ts_ms < earliest_time:
-                                    earliest_time = ts_ms
-                                if latest_time is None or ts_ms > latest_time:
-                                    latest_time = ts_ms
-
-                        # Write line
-                        if not line.endswith("\n"):
-                            line += "\n"
-                        fh.write(line)
-
-                        events += 1
-                        if events % 10000 == 0:  # More frequent flushes
-                            fh.flush()
-                            logger.debug(f"{key}: Processed {events} events")
-
-                    except ValueError as e:
-                        logger.warning(f"{key}: Ignoring malformed line: {e}")
-                    except Exception as e:
-                        logger.error(f"{key}: Error processing line: {e}")
-
+                for buf, end in iter_line_blocks(stream, free=writer.free):
+                    count, chunk_min, chunk_max = process_chunk(key, buf, end, writer)
+                    events += count
+                    # Keep bounds local; they are merged by the parent process
+                    if chunk_min is not None and (local_min is None or chunk_min < local_min):
+                        local_min = chunk_min
+                    if chunk_max is not None and (local_max is None or chunk_max > local_max):
+                        local_max = chunk_max
             finally:
-                fh.flush()
+                writer.close()
 
         # Cleanup stream
         stream.close()
+        decoder.join()
+        if decoder.error is not None:
+            # The output stops wherever decoding failed; don't leave it looking complete
+            os.remove(out_path)
+            raise decoder.error
 
         proc_time = max(0.0, time.time() - start_proc)
 
-        # Update global stats
-        with stats_lock:
-            total_events += events
-            total_processing_time += proc_time
-
         thr = (events / proc_time) if proc_time > 0 else 0.0
         logger.info(f"Completed {key}: {events} events in {proc_time:.2f}s ({thr:.2f} ev/s)")
 
-        return out_path, events, proc_time, thread_name
+        return out_path, events, proc_time, local_min, local_max, worker_name
 
     except Exception as e:
-        logger.error(f"Failed processing {obj_summary.key}: {e}")
+        logger.error(f"Failed processing {key}: {e}")
         raise
 
 
 def main():
+    # Records from every process go through one queue to a single writer thread
+    log_queue = multiprocessing.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    setup_queue_logging(log_queue)
+    listener.start()
+    try:
+        run(log_queue)
+    finally:
+        listener.stop()
+
+
+def run(log_queue):
     logger.info(f"Starting with MAX_WORKERS={MAX_WORKERS}")
 
     # List objects first
@@ -206,24 +464,39 @@ def main():
     actual_workers = min(MAX_WORKERS, len(objs))
     logger.info(f"Processing {len(objs)} files with {actual_workers} workers")
 
+    # Create the output directory once here rather than in every worker
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
     t0 = time.time()
     outputs = []
+    total_events = 0
+    total_processing_time = 0.0
+    earliest_time = None
+    latest_time = None
 
     try:
-        # Use context manager with timeout
-        with ThreadPoolExecutor(max_workers=actual_workers,
-                                thread_name_prefix="S3Worker") as pool:
+        # Snappy + parsing is CPU-bound, so spread files over processes, not threads
+        with ProcessPoolExecutor(max_workers=actual_workers,
+                                 initializer=setup_queue_logging,
+                                 initargs=(log_queue,)) as pool:
             # Submit all tasks
-            futures = {pool.submit(process_object, obj): obj.key for obj in objs}
+            futures = {pool.submit(process_object, obj["Bucket"], obj["Key"]): obj["Key"] for obj in objs}
 
             # Process results with timeout
             for fut in as_completed(futures, timeout=DOWNLOAD_TIMEOUT * len(objs)):
                 key = futures[fut]
                 try:
-                    out_path, events, proc_time, thread_name = fut.result(timeout=30)
-                    logger.info(f"Thread {thread_name} completed {key}: {events} events")
+                    out_path, events, proc_time, min_ts, max_ts, worker_name = fut.result(timeout=30)
+                    logger.info(f"Worker {worker_name} completed {key}: {events} events")
                     outputs.append(out_path)
 
+                    total_events += events
+                    total_processing_time += proc_time
+                    if min_ts is not None and (earliest_time is None or min_ts < earliest_time):
+                        earliest_time = min_ts
+                    if max_ts is not None and (latest_time is None or max_ts > latest_time):
+                        latest_time = max_ts
+
                 except TimeoutError:
                     logger.error(f"Timeout processing {key}")
                     fut.cancel()
@@ -234,7 +507,7 @@ def main():
         logger.info("Interrupted by user")
         return
     except Exception as e:
-        logger.error(f"ThreadPool error: {e}")
+        logger.error(f"ProcessPool error: {e}")
         return
 
     total_time = max(0.0, time.time() - t0)
@@ -1,17 +1,52 @@
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
 from AdaptTimeOption import AdaptTimeOption
 from Event import Event
 
+try:
+    # orjson parses the UTF-8 payload bytes directly and is several times faster
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_MS = timedelta(milliseconds=1)
+
+
+@lru_cache(maxsize=131072)
+def iso_to_millis(value):
+    """Epoch milliseconds for an ISO-8601 time; times without an offset are UTC.
+
+    Dropoff times repeat at minute resolution, so most calls are cache hits.
+    """
+    if isinstance(value, bytes):
+        value = value.decode("ascii")
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return round((dt - _EPOCH) / _ONE_MS)
+
 
 class TripEvent(Event):
+    __slots__ = ("trip_id", "timestamp")
+
     def __init__(self, payload):
         super().__init__(payload)
-        json_data = json.loads(self.payload)
+        json_data = _json_loads(self.payload)
         self.trip_id = json_data["trip_id"]
         #self.timestamp = datetime.fromisoformat(json_data["dropoff_datetime"]).timestamp() * 1000
-        # Assuming json_data["dropoff_datetime"] is something like "2016-01-01T05:33:00.000Z"
-        self.timestamp = datetime.fromisoformat(json_data["dropoff_datetime"].rstrip("Z")).timestamp() * 1000
+        self.timestamp = TripEvent.parse_timestamp(json_data["dropoff_datetime"])
+
+    @staticmethod
+    def parse_timestamp(value):
+        # Assuming value is something like "2016-01-01T05:33:00.000Z" (str or bytes)
+        return iso_to_millis(value)
 
     @staticmethod
     def adapt_time(event, adapt_time_option):
@@ -26,32 +61,30 @@ class TripEvent(Event):
 
     @staticmethod
     def from_string_shift_origin(payload, time_delta):
-        json_data = json.loads(payload)
-        pickup_time = datetime.fromisoformat(json_data["pickup_datetime"])
-        dropoff_time = datetime.fromisoformat(json_data["dropoff_datetime"])
+        json_data = _json_loads(payload)
+        pickup_time = datetime.fromisoformat(json_data["pickup_datetime"].rstrip("Z"))
+        dropoff_time = datetime.fromisoformat(json_data["dropoff_datetime"].rstrip("Z"))
 
         json_data["pickup_datetime"] = (pickup_time + time_delta).isoformat()
         json_data["dropoff_datetime"] = (dropoff_time + time_delta).isoformat()
 
-        return TripEvent(json.dumps(json_data))
+        return TripEvent(_json_dumps(json_data))
 
     @staticmethod
     def from_string_overwrite_time(payload):
-        json_data = json.loads(payload)
-        pickup_time = datetime.fromisoformat(json_data["pickup_datetime"])
-        dropoff_time = datetime.fromisoformat(json_data["dropoff_datetime"])
-        time_delta = datetime.now() - dropoff_time
+        json_data = _json_loads(payload)
+        pickup_time = datetime.fromisoformat(json_data["pickup_datetime"].rstrip("Z"))
+        dropoff_time = datetime.fromisoformat(json_data["dropoff_datetime"].rstrip("Z"))
+        # Dropoff times are naive UTC (the "Z" is stripped), so measure against UTC now
+        time_delta = datetime.now(timezone.utc).replace(tzinfo=None) - dropoff_time
 
         json_data["pickup_datetime"] = (pickup_time + time_delta).isoformat()
         json_data["dropoff_datetime"] = (dropoff_time + time_delta).isoformat()
 
-        return TripEvent(json.dumps(json_data))
+        return TripEvent(_json_dumps(json_data))
     
     def get_partition_key(self):
         return str(self.trip_id)
     
     def __lt__(self, other):
-        return self.trip_id < other.trip_id
-    
-    def __hash__(self):
-        return hash(self.payload)
\ No newline at end of file
+        return self.trip_id < other.trip_id
\ No newline at end of file
@@ -13,7 +13,9 @@ $DESCRIPTION$
 import uuid
 import snappy
 import boto3
-import io
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 # --- Source bucket (NYC) ---
@@ -21,12 +23,20 @@ SRC_REGION = "us-east-1"
 SRC_BUCKET = "aws-bigdata-blog"
 SRC_PREFIX = "artifacts/flink-refarch/data/nyc-tlc-trips.snz/"
 
-src_s3 = boto3.client("s3", region_name=SRC_REGION)
+PART_SIZE = 8 * 1024 * 1024  # S3 requires >= 5 MiB for every part but the last
+UPLOAD_WORKERS = 4  # parts uploading concurrently per object
+OBJECT_WORKERS = 16  # objects transcoded concurrently
+
+# Clients are thread-safe and shared by every worker; pools are sized so no
+# worker waits on a connection (each object also uploads UPLOAD_WORKERS parts).
+src_s3 = boto3.client("s3", region_name=SRC_REGION,
+                      config=Config(max_pool_connections=32))
 
 # --- Destination bucket (your MAC-prefixed bucket) ---
 DST_REGION = "us-east-2"
 session_dst = boto3.session.Session(region_name=DST_REGION)
-dst_s3 = session_dst.client("s3")
+dst_s3 = session_dst.client(
+    "s3", config=Config(max_pool_connections=max(32, OBJECT_WORKERS * UPLOAD_WORKERS)))
 effective_region = dst_s3.meta.region_name
 
 def get_mac_prefix() -> str:
@@ -74,6 +84,108 @@ def ensure_bucket(bucket: str, client_region: str):
         )
     print(f"[INFO] Created bucket: {bucket} in {client_region}")
 
+# ---- streaming multipart upload target for the decompressor ----
+class MultipartUploadWriter:
+    """Write-only file-like object that streams into an S3 multipart upload.
+
+    Each PART_SIZE bytes written become one part, uploaded on a small thread pool
+    while decompression continues, so memory stays near (workers + 1) * part_size
+    instead of the whole decompressed object. Completes on a clean exit from the
+    with block and aborts the upload on an exception.
+    """
+
+    def __init__(self, client, bucket: str, key: str,
+                 part_size: int = PART_SIZE, workers: int = UPLOAD_WORKERS):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.workers = workers
+        self.upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+        self.buf = bytearray()
+        self.part_number = 0
+        self.pending = deque()
+        self.parts = []
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def _upload_part(self, number: int, data: bytes):
+        resp = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                       PartNumber=number, Body=data)
+        return {"PartNumber": number, "ETag": resp["ETag"]}
+
+    def _submit(self, data: bytes):
+        # Bound the parts held in memory: wait for the oldest before queuing more
+        if len(self.pending) >= self.workers:
+            self.parts.append(self.pending.popleft().result())
+        self.part_number += 1
+        self.pending.append(self.pool.submit(self._upload_part, self.part_number, data))
+
+    def write(self, data) -> int:
+        self.buf += data
+        while len(self.buf) >= self.part_size:
+            self._submit(bytes(self.buf[:self.part_size]))
+            del self.buf[:self.part_size]
+        return len(data)
+
+    def _abort(self):
+        # Let in-flight parts finish first; a part landing after the abort can be kept by S3
+        for fut in self.pending:
+            fut.cancel()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key,
+                                           UploadId=self.upload_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._complete()
+            else:
+                self._abort()
+        finally:
+            self.pool.shutdown(wait=True)
+        return False
+
+    def _complete(self):
+        if self.part_number == 0 and not self.buf:
+            # A multipart upload needs at least one part; store empty output directly
+            self._abort()
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=b"")
+            return
+        try:
+            if self.buf:
+                self._submit(bytes(self.buf))
+                self.buf.clear()
+            self.parts.extend(f.result() for f in self.pending)
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                  MultipartUpload={"Parts": self.parts})
+        except Exception:
+            self._abort()
+            raise
+
+
+def transcode_one(key: str):
+    # Get object (client) -> response dict
+    resp = src_s3.get_object(Bucket=SRC_BUCKET, Key=key)
+    body = resp["Body"]  # StreamingBody (file-like)
+    size = resp.get("ContentLength", 0)
+
+    # Prepare destination key (strip .snz)
+    filename = key.rsplit("/", 1)[-1]
+    # out_name = filename[:-4] + ".txt" # remove ".snz"
+    # replace snz with txt
+    out_name = filename.replace(".snz", ".txt")
+    dst_key = f"{DST_PREFIX}/{filename}" if DST_PREFIX else filename
+
+    # Stream-decompress from S3 -> multipart upload parts, never holding the whole object
+    with MultipartUploadWriter(dst_s3, DST_BUCKET, dst_key) as dst:
+        snappy.stream_decompress(src=body, dst=dst)   # ✅ correct streaming API
+
+    print(f"[INFO] {key} ({size} bytes) -> s3://{DST_BUCKET}/{dst_key}")
+
+
 print(f"[DEBUG] Destination client region: {effective_region}")
 ensure_bucket(DST_BUCKET, effective_region)
 
@@ -81,29 +193,20 @@ ensure_bucket(DST_BUCKET, effective_region)
 paginator = src_s3.get_paginator("list_objects_v2")
 pages = paginator.paginate(Bucket=SRC_BUCKET, Prefix=SRC_PREFIX)
 
-for page in pages:
-    for item in page.get("Contents", []):
-        key = item["Key"]
-        # Skip folder placeholders and non-.snz files
-        if key.endswith("/") or not key.endswith(".snz"):
-            continue
-
-        # Get object (client) -> response dict
-        resp = src_s3.get_object(Bucket=SRC_BUCKET, Key=key)
-        body = resp["Body"]  # StreamingBody (file-like)
-        size = resp.get("ContentLength", 0)
-
-        # Prepare destination key (strip .snz)
-        filename = key.rsplit("/", 1)[-1]
-        # out_name = filename[:-4] + ".txt" # remove ".snz"
-        # replace snz with txt
-        out_name = filename.replace(".snz", ".txt")
-        dst_key = f"{DST_PREFIX}/{filename}" if DST_PREFIX else filename
-
-        # Stream-decompress from S3 -> memory buffer -> upload
-        buf = io.BytesIO()
-        snappy.stream_decompress(src=body, dst=buf)   # ✅ correct streaming API
-        buf.seek(0)
-        dst_s3.upload_fileobj(buf, DST_BUCKET, dst_key)
-
-        print(f"[INFO] {key} ({size} bytes) -> s3://{DST_BUCKET}/{dst_key}")
\ No newline at end of file
+# Skip folder placeholders and non-.snz files
+keys = [item["Key"] for page in pages for item in page.get("Contents", [])
+        if item["Key"].endswith(".snz")]
+
+# Objects are independent, so transcode them concurrently rather than one after another
+failed = 0
+with ThreadPoolExecutor(max_workers=OBJECT_WORKERS) as pool:
+    futures = {pool.submit(transcode_one, key): key for key in keys}
+    for fut in as_completed(futures):
+        key = futures[fut]
+        try:
+            fut.result()
+        except Exception as e:
+            failed += 1
+            print(f"[ERROR] Failed transcoding {key}: {e}")
+
+print(f"[INFO] Transcoded {len(keys) - failed}/{len(keys)} objects, {failed} failed")
@@ -10,6 +10,7 @@ $DESCRIPTION$
 """
 
 import os
+import sys
 import snappy
 
 # with open(local_snz_path, "rb") as src, open(out_path, "wb") as dst:
@@ -17,23 +18,21 @@ import snappy
 
 local_snz_path = "./"
 dst_dir = "./snappy_decompress/"
+io_buffer_size = 1 << 20  # 1 MiB reads/writes instead of the 64 KiB / 8 KiB defaults
 
 if not os.path.exists(dst_dir):
     os.makedirs(dst_dir)
 for filename in os.listdir(local_snz_path):
     if filename.endswith(".snz"):
         out_path = os.path.join(dst_dir, filename[:-4])  # Remove .snz extension
-        with open(os.path.join(local_snz_path, filename), "rb") as src, open(out_path, "wb") as dst:
-            snappy.stream_decompress(src=src, dst=dst)
+        with open(os.path.join(local_snz_path, filename), "rb") as src, \
+                open(out_path, "wb", buffering=io_buffer_size) as dst:
+            snappy.stream_decompress(src=src, dst=dst, blocksize=io_buffer_size)
         print(f"Decompressed {filename} to {out_path}")
 
-# I want to open notepad using os module and capture the PID
-pid = os.system("notepad.exe")
-print(f"Notepad opened with PID: {pid}")
-
-# Want to read each decompressed file and print the first 100 lines
-for filename in os.listdir(dst_dir):
-    if not filename.endswith(".snz"):
+# Print the first 100 lines of each decompressed file only when asked to
+if "--preview" in sys.argv:
+    for filename in os.listdir(dst_dir):
         out_path = os.path.join(dst_dir, filename)
         print(f"Reading {out_path}:")
         with open(out_path, "r") as file: